@@ -4,6 +4,7 @@
 """Asynchronous Google Drive file downloader."""
 
 from ._callbacks import FileDownloadCallback, FolderDownloadCallback
+from ._client import GDownClient
 from ._download import download_file, download_folder
 from ._fetch import fetch_file, fetch_folder
 from ._records import File, Folder
@@ -14,6 +15,7 @@ __all__ = [
     "FileDownloadCallback",
     "Folder",
     "FolderDownloadCallback",
+    "GDownClient",
     "__version__",
     "download_file",
     "download_folder",
@@ -0,0 +1,59 @@
+# Copyright 2024 Francesco Gentile.
+# SPDX-License-Identifier: MIT
+
+import copy
+import time
+from collections import OrderedDict
+
+from ._records import Folder
+
+# how long (in seconds) a folder listing is considered fresh
+_TTL = 300.0
+# maximum number of cached listings, the least recently used ones are evicted first
+_MAX_SIZE = 1024
+
+# maps the ID of a folder to the time it was fetched and its direct children (from
+# the least to the most recently used)
+_FOLDERS: OrderedDict[str, tuple[float, Folder]] = OrderedDict()
+
+
+def get_cached_folder(id_: str) -> Folder | None:
+    """Returns the cached listing of a Google Drive folder.
+
+    Args:
+        id_: The ID of the folder.
+
+    Returns:
+        A copy of the cached folder (whose subfolders are empty) or `None` if the
+        folder is not cached or its listing has expired.
+    """
+    entry = _FOLDERS.get(id_)
+    if entry is None:
+        return None
+
+    fetched_at, folder = entry
+    if time.monotonic() - fetched_at >= _TTL:
+        del _FOLDERS[id_]
+        return None
+
+    _FOLDERS.move_to_end(id_)
+    # the callers fill the subfolders in place, so the cached copy must not leak
+    return copy.deepcopy(folder)
+
+
+def cache_folder(folder: Folder) -> None:
+    """Caches the listing of a Google Drive folder.
+
+    Args:
+        folder: The folder to cache (whose subfolders are empty).
+    """
+    now = time.monotonic()
+    # the expired listings are dropped even if they are never requested again
+    expired = [k for k, (t, _) in _FOLDERS.items() if now - t >= _TTL]
+    for id_ in expired:
+        del _FOLDERS[id_]
+
+    _FOLDERS[folder.id] = (now, copy.deepcopy(folder))
+    _FOLDERS.move_to_end(folder.id)
+    while len(_FOLDERS) > _MAX_SIZE:
+        _FOLDERS.popitem(last=False)
@@ -62,9 +62,11 @@ class FileDownloadCallback(Protocol):
     async def on_file_progress(self, file: File, downloaded: int, total: int) -> None:
         """Called during the download of the file.
 
-        This method is called after each chunk of data is downloaded. If the file is
-        small, this method may be called only once (so `downloaded` will be equal to
-        `total`), otherwise it will be called multiple times.
+        This method is called periodically while the data is downloaded (roughly
+        every megabyte or every 50 milliseconds, whichever comes first) and always
+        once after the last chunk of data is received. If the file is small, this
+        method may be called only once (so `downloaded` will be equal to `total`),
+        otherwise it will be called multiple times.
 
         Args:
             file: The Google Drive file.
@@ -130,6 +132,13 @@ class FolderDownloadCallback(FileDownloadCallback, Protocol):
             This method is called only once at the beginning of the download
             for the root folder (i.e., it is not called for its subfolders).
 
+        Note:
+            If the folder is downloaded from its ID or URL, its structure is
+            retrieved during the download, so at this point the subfolders of the
+            root folder are still empty. The items of each subfolder are known
+            when [on_folder_start][gdown_async.FolderDownloadCallback.on_folder_start]
+            is called for it.
+
         Args:
             folder: The root folder.
             path: The directory where the items of the folder will be saved (and
@@ -140,7 +149,8 @@ class FolderDownloadCallback(FileDownloadCallback, Protocol):
         """Called when the download of a folder starts.
 
         This method is called for each folder in the hierarchy, starting from
-        the root folder and then for each subfolder.
+        the root folder and then for each subfolder. The items of the folder are
+        always known when this method is called.
 
         Args:
             folder: The folder that is being downloaded.
@@ -0,0 +1,143 @@
+# Copyright 2024 Francesco Gentile.
+# SPDX-License-Identifier: MIT
+
+import os
+from types import TracebackType
+
+import aiohttp
+from typing_extensions import Self
+
+from ._callbacks import FileDownloadCallback, FolderDownloadCallback
+from ._download import download_file, download_folder
+from ._fetch import fetch_file, fetch_folder
+from ._records import File, Folder
+from ._utils import create_session
+
+
+class GDownClient:
+    """A client that owns the session used to fetch and download from Google Drive.
+
+    The client is an asynchronous context manager: the session is created when
+    entering the context and it is closed when exiting it, so that all the requests
+    sent in between reuse the same pool of connections.
+
+    Example:
+        ```python
+        async with GDownClient() as client:
+            folder = await client.fetch_folder("folder_id_or_url")
+            await client.download_folder(folder, output_dir="path/to/output/dir")
+        ```
+    """
+
+    def __init__(self, session: aiohttp.ClientSession | None = None) -> None:
+        """Initializes the client.
+
+        Args:
+            session: The client session to use for the requests. If `None`, a new
+                session is created when entering the context and closed when
+                exiting it. Otherwise, the session is left open on exit.
+        """
+        self._session = session
+        self._owns_session = session is None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The client session used for the requests.
+
+        Raises:
+            RuntimeError: If the client has not been entered yet.
+        """
+        if self._session is None:
+            msg = "The client must be used as an async context manager."
+            raise RuntimeError(msg)
+
+        return self._session
+
+    async def __aenter__(self) -> Self:
+        if self._session is None:
+            self._session = create_session()
+
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch_file(self, id_or_url: str) -> File:
+        """Retrieves the name of a Google Drive file.
+
+        See [fetch_file][gdown_async.fetch_file] for more details.
+        """
+        return await fetch_file(id_or_url, session=self.session)
+
+    async def fetch_folder(
+        self,
+        id_or_url: str,
+        *,
+        max_depth: int | None = None,
+        max_concurrency: int | None = 10,
+        use_cache: bool = True,
+    ) -> Folder:
+        """Retrieves the structure of a Google Drive folder.
+
+        See [fetch_folder][gdown_async.fetch_folder] for more details.
+        """
+        return await fetch_folder(
+            id_or_url,
+            max_depth=max_depth,
+            max_concurrency=max_concurrency,
+            use_cache=use_cache,
+            session=self.session,
+        )
+
+    async def download_file(
+        self,
+        x: File | str,
+        /,
+        *,
+        output_dir: os.PathLike[str] | str = ".",
+        force: bool = False,
+        callback: FileDownloadCallback | None = None,
+    ) -> None:
+        """Downloads a file from Google Drive.
+
+        See [download_file][gdown_async.download_file] for more details.
+        """
+        await download_file(
+            x,
+            output_dir=output_dir,
+            force=force,
+            callback=callback,
+            session=self.session,
+        )
+
+    async def download_folder(  # noqa: PLR0913
+        self,
+        x: Folder | str,
+        /,
+        *,
+        output_dir: os.PathLike[str] | str = ".",
+        force: bool = False,
+        max_concurrency: int | None = None,
+        use_cache: bool = True,
+        callback: FolderDownloadCallback | None = None,
+    ) -> None:
+        """Downloads a folder from Google Drive.
+
+        See [download_folder][gdown_async.download_folder] for more details.
+        """
+        await download_folder(
+            x,
+            output_dir=output_dir,
+            force=force,
+            max_concurrency=max_concurrency,
+            use_cache=use_cache,
+            callback=callback,
+            session=self.session,
+        )
@@ -1,26 +1,61 @@
 # Copyright 2024 Francesco Gentile.
 # SPDX-License-Identifier: MIT
 
+import dataclasses
 import functools
+import json
+import math
 import os
-from typing import cast
+import pathlib
+import re
+import sys
+from collections.abc import Iterator
+from typing import TypeAlias, cast
 
 import aiohttp
 import anyio
-import bs4
+from anyio.abc import TaskGroup
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 
 from ._callbacks import FileDownloadCallback, FolderDownloadCallback
-from ._fetch import fetch_file, fetch_folder
+from ._fetch import (
+    _fetch_folder_page,  # pyright: ignore[reportPrivateUsage]
+    fetch_file,
+)
+from ._parse import parse_download_form
 from ._records import File, Folder
+from ._retry import retry_get
 from ._utils import (
     check_file_path,
     check_folder_path,
+    create_session,
     extract_file_id,
     extract_folder_id,
-    init_session,
     is_url,
 )
 
+if sys.version_info < (3, 11):  # pragma: no cover
+    from exceptiongroup import BaseExceptionGroup
+
+# size of the chunks read from the response, large enough to amortize the cost of
+# each iteration of the download loop
+_CHUNK_SIZE = 256 * 1024
+# data is written to disk in blocks of this size to reduce the number of syscalls
+# and of round trips to the worker threads
+_WRITE_BUFFER_SIZE = 1024 * 1024
+# maximum number of chunks written at once (the smallest IOV_MAX among the platforms)
+_MAX_WRITE_CHUNKS = 1024
+# the progress callback is called at most once every this many bytes or seconds
+_PROGRESS_BYTES = 1024 * 1024
+_PROGRESS_INTERVAL = 0.05
+# format of the `Content-Range` header of a partial response
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+# a file to download within a folder
+_FileJob: TypeAlias = "tuple[File, anyio.Path, _FolderState]"
+# maximum number of folders retrieved concurrently while downloading a folder (if
+# the maximum concurrency is not given, otherwise it is shared with the downloads)
+_DISCOVERY_CONCURRENCY = 10
+
 
 async def download_file(
     x: File | str,
@@ -29,6 +64,7 @@ async def download_file(
     output_dir: os.PathLike[str] | str = ".",
     force: bool = False,
     callback: FileDownloadCallback | None = None,
+    session: aiohttp.ClientSession | None = None,
 ) -> None:
     """Downloads a file from Google Drive.
 
@@ -43,40 +79,53 @@ async def download_file(
             `False` and a file with the same name already exists, the download will be
             skipped (no check is performed on the content of the file).
         callback: A callback to use for the download of the file.
+        session: The client session to use for the requests. If `None`, a new
+            session is created for this call and closed before returning (use a
+            [GDownClient][gdown_async.GDownClient] to reuse the connections across
+            multiple calls).
 
     Raises:
         NotADirectoryError: If the output path already exists and is not a directory.
         IsADirectoryError: If the output path already exists and is a not a file.
         ValueError: If the file URL is invalid.
     """
+    if session is None:
+        async with create_session() as new_session:
+            await download_file(
+                x,
+                output_dir=output_dir,
+                force=force,
+                callback=callback,
+                session=new_session,
+            )
+        return
+
     if isinstance(x, str):
         id_ = extract_file_id(x) if is_url(x) else x
-        file = await fetch_file(id_)
+        file = await fetch_file(id_, session=session)
     else:
         file = x
 
     path = anyio.Path(output_dir) / file.name
-    await check_file_path(path)
-
-    if await path.exists() and not force:
+    exists = await check_file_path(path)
+    if not force and exists:
         if callback is not None:
             await callback.on_file_skip(file, path)
         return
 
-    await path.unlink(missing_ok=True)
-    async with aiohttp.ClientSession() as session:
-        init_session(session)
-        await _download_file(file, path, session=session, callback=callback)
+    await _download_file(file, path, session=session, callback=callback)
 
 
-async def download_folder(
+async def download_folder(  # noqa: PLR0913
     x: Folder | str,
     /,
     *,
     output_dir: os.PathLike[str] | str = ".",
     force: bool = False,
     max_concurrency: int | None = None,
+    use_cache: bool = True,
     callback: FolderDownloadCallback | None = None,
+    session: aiohttp.ClientSession | None = None,
 ) -> None:
     """Downloads a folder from Google Drive.
 
@@ -85,15 +134,28 @@ async def download_folder(
             folder structure. If the folder structure is provided, only the items in
             the structure will be downloaded (i.e., if you query the structure of a
             folder and then you remove some items from it, only the remaining items
-            will be downloaded, not the whole original folder).
+            will be downloaded, not the whole original folder). If the ID or URL is
+            provided, the structure of the folder is retrieved while the folder is
+            being downloaded, so that the files of each subfolder start downloading
+            as soon as the subfolder is found.
         output_dir: The directory where to save the folder. If the directory does not
             exist, it will be created. If it exists, the folder will be saved inside it.
         force: Whether to force the download of all the files even if they already
             exist. If `False` and a file already exists, the download will be skipped
             (no check is done to verify if the file is complete, corrupted or outdated).
-        max_concurrency: The maximum number of concurrent downloads. If `None`, the
-            number of concurrent downloads is not limited.
+        max_concurrency: The maximum number of concurrent requests, i.e. of files
+            being downloaded and subfolders being retrieved. If `None`, the number
+            of concurrent downloads is not limited (the subfolders are retrieved at
+            most 10 at a time).
+        use_cache: If `True` and the ID or URL of the folder is provided, the
+            folders fetched in the last five minutes (by any function of this
+            package) are not requested again. Set this to `False` to always
+            download the current contents of the folders.
         callback: A callback to use for the download of the folder.
+        session: The client session to use for the requests. If `None`, a new
+            session is created for this call and closed before returning (use a
+            [GDownClient][gdown_async.GDownClient] to reuse the connections across
+            multiple calls).
 
     Raises:
         ValueError: If the maximum concurrency is less than 1.
@@ -102,36 +164,63 @@ async def download_folder(
         NotADirectoryError: If the location where the folder or any of its subfolders
             should be saved is not a directory.
         IsADirectoryError: If the location where a file should be saved is a directory.
+            If `force` is `True`, this is detected right before downloading the file.
     """
     if max_concurrency is not None and max_concurrency < 1:
         msg = f"Max concurrency must be greater than 0, got {max_concurrency}."
         raise ValueError(msg)
 
+    if session is None:
+        async with create_session() as new_session:
+            await download_folder(
+                x,
+                output_dir=output_dir,
+                force=force,
+                max_concurrency=max_concurrency,
+                use_cache=use_cache,
+                callback=callback,
+                session=new_session,
+            )
+        return
+
     if isinstance(x, str):
         id_ = extract_folder_id(x) if is_url(x) else x
-        folder = await fetch_folder(id_)
+        discovery = anyio.CapacityLimiter(max_concurrency or _DISCOVERY_CONCURRENCY)
+        folder = await _fetch_folder_page(
+            id_,
+            session=session,
+            limiter=discovery,
+            use_cache=use_cache,
+        )
+        if folder is None:
+            msg = f"No folder found with ID '{id_}'."
+            raise FileNotFoundError(msg)
     else:
-        folder = x
+        folder, discovery = x, None
 
     success = False
     path = anyio.Path(output_dir) / folder.name
-    await check_folder_path(folder, path)
+    if not force:
+        # existing files are overwritten when forcing the download, so only the
+        # directories (created below) need to be checked
+        await check_folder_path(folder, path)
+
+    # create all the directories that are already known with a single thread call
+    dirs = list(_iter_dirs(folder, pathlib.Path(path)))
+    await anyio.to_thread.run_sync(_make_dirs, dirs)
 
     try:
         if callback is not None:
             await callback.on_folder_setup(folder, path)
 
-        limiter = anyio.CapacityLimiter(max_concurrency) if max_concurrency else None
-        async with aiohttp.ClientSession() as session:
-            init_session(session)
-            await _download_folder(
-                folder,
-                path=path,
-                force=force,
-                session=session,
-                limiter=limiter,
-                callback=callback,
-            )
+        downloader = _FolderDownloader(
+            force=force,
+            session=session,
+            discovery=discovery,
+            use_cache=use_cache,
+            callback=callback,
+        )
+        await downloader.run(folder, path, max_concurrency=max_concurrency)
 
         success = True
     finally:
@@ -156,70 +245,119 @@ async def _download_file(  # noqa: C901, PLR0912, PLR0915
     Args:
         file: The Google Drive file.
         path: The path where the file will be saved. This must be a file path,
-            not a directory path (no check is performed to ensure this).
+            not a directory path, and its parent directory must already exist (no
+            check is performed to ensure this).
         session: The aiohttp client session.
         callback: A callback to use for the download of the file.
     """
-    response, success = None, False
+    # the ID is part of the name so that different files downloaded to the same
+    # path do not share (and corrupt) the same partial download
+    tmp_path = path.parent / f".{path.name}.{file.id}.gdown"
+    form_path = path.parent / f".{path.name}.{file.id}.gdown.json"
+    response, fd, success = None, None, False
     try:
         if callback is not None:
             await callback.on_file_setup(file, path)
 
-        await path.parent.mkdir(parents=True, exist_ok=True)
-        tmp_path = path.parent / f"{path.name}.gdown"
-        await tmp_path.touch()
-
-        params = {"id": file.id, "export": "download"}
-        response = await session.get("https://drive.google.com/uc", params=params)
-        if response.status != 200:
-            await tmp_path.unlink()
-            msg = f"Failed to download file with ID '{file.id}'."
-            raise RuntimeError(msg)
-
-        if response.headers["Content-Type"].startswith("text/html"):
-            # we received the HTML page that asks the user to confirm the download
-            soup = bs4.BeautifulSoup(await response.text(), "html.parser")
-            response.close()
-
-            form = soup.find("form")
-            if form is None or not isinstance(form, bs4.Tag):
-                await tmp_path.unlink()
+        fn = functools.partial(_open_tmp_file, tmp_path, form_path)
+        fd, downloaded, form = await anyio.to_thread.run_sync(fn)
+        # the content is requested uncompressed, so that it does not need to be
+        # decompressed and its size matches the `Content-Length` header
+        headers = {"Accept-Encoding": "identity"}
+        if downloaded > 0:
+            # set the `Range` header to resume the download
+            headers["Range"] = f"bytes={downloaded}-"
+
+        if form is not None:
+            # resume with the form of the previous attempt, so that the confirmation
+            # page does not need to be requested again
+            url, params = form
+            response = await retry_get(session, url, params=params, headers=headers)
+            if response.status != 206 or _is_html(response):
+                # the form has expired, start over from the confirmation page
+                response.close()
+                response = None
+
+        if response is None:
+            params = {"id": file.id, "export": "download"}
+            url = "https://drive.google.com/uc"
+            response = await retry_get(
+                session,
+                url,
+                params=params,
+                headers={"Accept-Encoding": "identity"},
+            )
+            if response.status != 200:
                 msg = f"Failed to download file with ID '{file.id}'."
                 raise RuntimeError(msg)
 
-            params = {
-                input_["name"]: input_["value"]
-                for input_ in form.find_all("input")
-                if input_.get("name") is not None
-            }
-
-            downloaded = (await tmp_path.stat()).st_size
-            headers = session.headers.copy()
-            if downloaded > 0:
-                # set the `Range` header to resume the download
-                headers["Range"] = f"bytes={downloaded}-"
-
-            url = cast(str, form["action"])
-            response = await session.get(url, params=params, headers=headers)
-        else:
+            if _is_html(response):
+                # we received the HTML page that asks the user to confirm the download
+                form = parse_download_form(await response.read())
+                response.close()
+                if form is None:
+                    msg = f"Failed to download file with ID '{file.id}'."
+                    raise RuntimeError(msg)
+
+                await anyio.to_thread.run_sync(_save_form, form_path, form)
+                url, params = form
+                response = await retry_get(session, url, params=params, headers=headers)
+
+        if response.status == 200 and downloaded > 0:
+            # the file is sent from the beginning (e.g., because it is served directly
+            # or the `Range` header was ignored), so the download cannot be resumed
+            await anyio.to_thread.run_sync(os.ftruncate, fd, 0)
             downloaded = 0
 
-        total = int(response.headers["Content-Length"]) + downloaded
+        total = _get_total_size(file, response, downloaded)
         if callback is not None:
             if downloaded == 0:
                 await callback.on_file_start(file, total)
             else:
                 await callback.on_file_resume(file, downloaded, total)
 
-        async with await anyio.open_file(tmp_path, "ab") as f:
-            async for chunk in response.content.iter_any():
-                await f.write(chunk)
+        # the chunks are buffered as they are and written with a single syscall,
+        # to avoid copying them into an intermediate buffer
+        chunks: list[bytes] = []
+        buffered = 0
+        # the progress is reported when the next threshold or deadline is reached,
+        # the callback is looked up only once and skipped if there is no callback
+        on_progress = None if callback is None else callback.on_file_progress
+        reported = downloaded
+        next_report = downloaded + _PROGRESS_BYTES
+        deadline = anyio.current_time() + _PROGRESS_INTERVAL
+        try:
+            async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                chunks.append(chunk)
+                buffered += len(chunk)
                 downloaded += len(chunk)
-
-                if callback is not None:
-                    await callback.on_file_progress(file, downloaded, total)
-
-        await tmp_path.rename(path)
+                if buffered >= _WRITE_BUFFER_SIZE or len(chunks) >= _MAX_WRITE_CHUNKS:
+                    # hand the chunks to the worker thread and start a new batch
+                    data, chunks, buffered = chunks, [], 0
+                    await anyio.to_thread.run_sync(_write_chunks, fd, data)
+
+                if on_progress is not None and (
+                    downloaded >= next_report or anyio.current_time() >= deadline
+                ):
+                    await on_progress(file, downloaded, total)
+                    reported = downloaded
+                    next_report = downloaded + _PROGRESS_BYTES
+                    deadline = anyio.current_time() + _PROGRESS_INTERVAL
+
+            data, chunks = chunks, []
+            await anyio.to_thread.run_sync(_write_chunks, fd, data)
+            if on_progress is not None and downloaded != reported:
+                await on_progress(file, downloaded, total)
+        finally:
+            # on failure, write what is left so that the download can be resumed
+            # (synchronously, since the task may have been cancelled)
+            _write_chunks(fd, chunks)
+            os.close(fd)
+            fd = None
+
+        # the file is replaced atomically, so any existing file is kept until the
+        # download completes successfully
+        await anyio.to_thread.run_sync(_finalize_tmp_file, tmp_path, path, form_path)
         if callback is not None:
             await callback.on_file_complete(file, total)
         success = True
@@ -231,76 +369,369 @@ async def _download_file(  # noqa: C901, PLR0912, PLR0915
         if response is not None and not response.closed:
             response.close()
 
+        if fd is not None:
+            os.close(fd)
+
+        if not success:
+            # the temporary file is created before the first request, so it is
+            # removed if the download failed before receiving any data (this is
+            # done synchronously, since the task may have been cancelled)
+            _discard_empty_tmp_file(tmp_path, form_path)
+
         if callback is not None:
             await callback.on_file_cleanup(file, success=success)
 
 
-async def _download_folder_file(  # noqa: PLR0913
-    file: File,
-    path: anyio.Path,
-    *,
-    force: bool,
-    session: aiohttp.ClientSession,
-    limiter: anyio.CapacityLimiter | None,
-    callback: FileDownloadCallback | None,
-) -> None:
-    if await path.exists() and not force:
-        if callback is not None:
-            await callback.on_file_skip(file, path)
+@dataclasses.dataclass(slots=True)
+class _FolderState:
+    """The download state of a folder."""
+
+    folder: Folder
+    parent: "_FolderState | None"
+    pending: int
+    done: bool = False
+
+
+class _FolderDownloader:
+    """Downloads a folder tree within a single task group.
+
+    The files are downloaded by a flat pool of workers fed by a memory object stream
+    (or by one task per file if the concurrency is not limited), while the folders
+    keep track of their pending items to know when they are complete.
+    """
+
+    def __init__(
+        self,
+        *,
+        force: bool,
+        session: aiohttp.ClientSession,
+        discovery: anyio.CapacityLimiter | None,
+        use_cache: bool,
+        callback: FolderDownloadCallback | None,
+    ) -> None:
+        """Initializes the downloader.
+
+        Args:
+            force: Whether to download the files even if they already exist.
+            session: The aiohttp client session.
+            discovery: If not `None`, the subfolders are assumed to be empty and
+                their items are retrieved from Google Drive (using this limiter to
+                bound the number of concurrent requests, also acquired by the file
+                workers if any) right before downloading them.
+            use_cache: Whether the subfolders can be retrieved from the cache.
+            callback: A callback to use for the download of the folder.
+        """
+        self.force = force
+        self.session = session
+        self.discovery = discovery
+        self.use_cache = use_cache
+        self.callback = callback
+        self.states: list[_FolderState] = []
+        self.send: MemoryObjectSendStream[_FileJob] | None = None
+
+    async def run(
+        self,
+        folder: Folder,
+        path: anyio.Path,
+        *,
+        max_concurrency: int | None,
+    ) -> None:
+        """Downloads the folder and all its items."""
+        try:
+            async with anyio.create_task_group() as tg:
+                if max_concurrency is not None:
+                    # the buffer is unbounded, so scheduling a file never blocks
+                    stream = anyio.create_memory_object_stream[_FileJob](math.inf)
+                    self.send, receive = stream
+                    with receive:
+                        for _ in range(max_concurrency):
+                            tg.start_soon(self._work, receive.clone())
+
+                await self._start_folder(tg, folder, path, parent=None)
+        except BaseException as exc:
+            # the task group wraps the errors of its tasks, but the callers expect
+            # the documented exceptions (e.g., a missing subfolder)
+            error = _unwrap_exception(exc)
+            if self.callback is not None:
+                # the innermost folders are notified first
+                for state in reversed(self.states):
+                    if not state.done:
+                        await self.callback.on_folder_fail(state.folder, error)
+
+            if error is exc:
+                raise
+
+            raise error from None
+        finally:
+            if self.send is not None:
+                self.send.close()
+
+    async def _start_folder(
+        self,
+        tg: TaskGroup,
+        folder: Folder,
+        path: anyio.Path,
+        *,
+        parent: _FolderState | None,
+    ) -> None:
+        """Schedules the download of all the items of a folder."""
+        state = _FolderState(folder, parent, len(folder.children))
+        self.states.append(state)
+        if self.callback is not None:
+            await self.callback.on_folder_start(folder)
+
+        if state.pending == 0:
+            await self._complete(state)
+            return
+
+        for idx, item in enumerate(folder.children):
+            item_path = path / item.name
+            if isinstance(item, File):
+                if self.send is None:
+                    tg.start_soon(self._download, item, item_path, state)
+                else:
+                    try:
+                        self.send.send_nowait((item, item_path, state))
+                    except anyio.BrokenResourceError:
+                        # the workers only stop early because of an error, which is
+                        # raised by the task group, so nothing else is scheduled
+                        return
+            elif self.discovery is not None:
+                args = (tg, state, idx, item_path, self.discovery)
+                tg.start_soon(self._discover_folder, *args)
+            else:
+                await self._start_folder(tg, item, item_path, parent=state)
+
+    async def _discover_folder(
+        self,
+        tg: TaskGroup,
+        parent: _FolderState,
+        idx: int,
+        path: anyio.Path,
+        discovery: anyio.CapacityLimiter,
+    ) -> None:
+        """Retrieves the items of a subfolder and then schedules its download."""
+        item = parent.folder.children[idx]
+        folder = await _fetch_folder_page(
+            item.id,
+            session=self.session,
+            limiter=discovery,
+            use_cache=self.use_cache,
+        )
+        if folder is None:
+            msg = f"No folder found with ID '{item.id}'."
+            raise FileNotFoundError(msg)
+
+        # replace the empty subfolder so that the structure is complete at the end
+        parent.folder.children[idx] = folder
+        if not self.force:
+            # as for the root folder, only the directories are checked when forcing
+            await check_folder_path(folder, path)
+
+        dirs = list(_iter_dirs(folder, pathlib.Path(path)))
+        await anyio.to_thread.run_sync(_make_dirs, dirs)
+        await self._start_folder(tg, folder, path, parent=parent)
+
+    async def _work(self, receive: MemoryObjectReceiveStream[_FileJob]) -> None:
+        """Downloads the files sent to the stream until it is closed."""
+        with receive:
+            async for file, path, state in receive:
+                if self.discovery is None:
+                    await self._download(file, path, state)
+                    continue
+
+                # the workers share the limiter of the subfolders, so that the
+                # maximum concurrency bounds all the requests
+                async with self.discovery:
+                    await self._download(file, path, state)
+
+    async def _download(
+        self, file: File, path: anyio.Path, state: _FolderState
+    ) -> None:
+        """Downloads a file of a folder."""
+        if self.force:
+            # the output paths are not checked upfront when forcing the download, so
+            # a directory in place of the file must be detected before downloading it
+            await check_file_path(path)
+            skip = False
+        else:
+            skip = await path.exists()
+
+        if skip:
+            if self.callback is not None:
+                await self.callback.on_file_skip(file, path)
+        else:
+            await _download_file(
+                file,
+                path,
+                session=self.session,
+                callback=self.callback,
+            )
 
+        await self._item_done(state)
+
+    async def _item_done(self, state: _FolderState) -> None:
+        """Marks an item of the folder as done."""
+        state.pending -= 1
+        if state.pending == 0:
+            await self._complete(state)
+
+    async def _complete(self, state: _FolderState) -> None:
+        """Marks the folder as complete and notifies its parent."""
+        state.done = True
+        if self.callback is not None:
+            await self.callback.on_folder_complete(state.folder)
+
+        if state.parent is not None:
+            await self._item_done(state.parent)
+        elif self.send is not None:
+            # the whole tree has been downloaded, let the workers exit
+            self.send.close()
+
+
+def _unwrap_exception(exc: BaseException) -> BaseException:
+    """Returns the only exception of a (nested) exception group, if any."""
+    if not isinstance(exc, BaseExceptionGroup):
+        return exc
+
+    group = cast("BaseExceptionGroup[BaseException]", exc)
+    if len(group.exceptions) != 1:
+        return group
+
+    return _unwrap_exception(group.exceptions[0])
+
+
+def _iter_dirs(folder: Folder, path: pathlib.Path) -> Iterator[pathlib.Path]:
+    """Yields the directories of a folder structure (parents before children)."""
+    yield path
+    for item in folder:
+        if isinstance(item, Folder):
+            yield from _iter_dirs(item, path / item.name)
+
+
+def _make_dirs(paths: list[pathlib.Path]) -> None:
+    """Creates all the given directories (parents before children) if missing."""
+    if not paths:
         return
 
-    await path.unlink(missing_ok=True)
-    if limiter is not None:
-        async with limiter:
-            await _download_file(file, path, session=session, callback=callback)
-    else:
-        await _download_file(file, path, session=session, callback=callback)
+    # only the ancestors of the first directory may be missing, the others are
+    # created after their parent
+    try:
+        paths[0].mkdir(parents=True, exist_ok=True)
+        for path in paths[1:]:
+            path.mkdir(exist_ok=True)
+    except FileExistsError as exc:
+        # the path exists but it is not a directory (otherwise no error is raised)
+        msg = f"Output directory '{exc.filename}' is not a directory."
+        raise NotADirectoryError(msg) from None
+
+
+def _get_total_size(
+    file: File,
+    response: aiohttp.ClientResponse,
+    downloaded: int,
+) -> int:
+    """Computes the size of the file, checking that the response resumes it."""
+    if response.status == 200:
+        return int(response.headers["Content-Length"])
+
+    if response.status == 206:
+        value = response.headers.get("Content-Range", "")
+        match = _CONTENT_RANGE_RE.fullmatch(value)
+        if match is None or int(match[1]) != downloaded:
+            msg = (
+                f"Failed to resume the download of the file with ID '{file.id}' "
+                f"(expected range starting at {downloaded}, got '{value}')."
+            )
+            raise RuntimeError(msg)
 
+        if match[3] != "*":
+            return int(match[3])
 
-async def _download_folder(  # noqa: PLR0913
-    folder: Folder,
+        return int(response.headers["Content-Length"]) + downloaded
+
+    msg = f"Failed to download file with ID '{file.id}'."
+    raise RuntimeError(msg)
+
+
+def _is_html(response: aiohttp.ClientResponse) -> bool:
+    """Checks whether the response is an HTML page instead of the file content."""
+    return response.headers.get("Content-Type", "").startswith("text/html")
+
+
+def _open_tmp_file(
     path: anyio.Path,
-    *,
-    force: bool = False,
-    session: aiohttp.ClientSession,
-    limiter: anyio.CapacityLimiter | None = None,
-    callback: FolderDownloadCallback | None = None,
+    form_path: anyio.Path,
+) -> tuple[int, int, tuple[str, dict[str, str]] | None]:
+    """Opens the temporary file of a download in append mode.
+
+    The file is created if it does not exist (its parent directory must exist). If
+    the file is not empty, the download form saved by the previous attempt is loaded
+    as well. Everything is done in a single function so that it can be run with a
+    single round trip to the worker threads.
+
+    Returns:
+        The file descriptor, the size of the file (i.e., the number of bytes
+        already downloaded) and the saved download form (if any).
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    size = os.fstat(fd).st_size
+    if size == 0:
+        return fd, size, None
+
+    try:
+        data = json.loads(pathlib.Path(form_path).read_bytes())
+        form = str(data["action"]), {str(k): str(v) for k, v in data["params"].items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        form = None
+
+    return fd, size, form
+
+
+def _save_form(path: anyio.Path, form: tuple[str, dict[str, str]]) -> None:
+    """Saves the download form next to the temporary file of the download."""
+    action, params = form
+    data = json.dumps({"action": action, "params": params})
+    pathlib.Path(path).write_text(data, encoding="utf-8")
+
+
+def _finalize_tmp_file(
+    tmp_path: anyio.Path, path: anyio.Path, form_path: anyio.Path
 ) -> None:
-    """Downloads a Google Drive folder recursively."""
+    """Moves the completed download to its path and removes the saved form."""
+    pathlib.Path(tmp_path).replace(path)
+    pathlib.Path(form_path).unlink(missing_ok=True)
+
+
+def _discard_empty_tmp_file(tmp_path: anyio.Path, form_path: anyio.Path) -> None:
+    """Removes the temporary file of a download (and its form) if it is empty."""
+    tmp = pathlib.Path(tmp_path)
     try:
-        if callback is not None:
-            await callback.on_folder_start(folder)
-
-        await path.mkdir(parents=True, exist_ok=True)
-        async with anyio.create_task_group() as tg:
-            for item in folder:
-                if isinstance(item, Folder):
-                    fn = functools.partial(
-                        _download_folder,
-                        item,
-                        path / item.name,
-                        force=force,
-                        session=session,
-                        callback=callback,
-                    )
-                else:
-                    fn = functools.partial(
-                        _download_folder_file,
-                        item,
-                        path / item.name,
-                        force=force,
-                        session=session,
-                        limiter=limiter,
-                        callback=callback,
-                    )
-
-                tg.start_soon(fn)
-    except BaseException as exc:
-        if callback is not None:
-            await callback.on_folder_fail(folder, exc)
+        if tmp.stat().st_size == 0:
+            tmp.unlink()
+            pathlib.Path(form_path).unlink(missing_ok=True)
+    except OSError:
+        # the file does not exist, or it cannot be removed and it is left in place
+        pass
+
+
+def _write_chunks(fd: int, chunks: list[bytes]) -> None:
+    """Writes all the chunks to the file descriptor (with one syscall if possible)."""
+    if not chunks:
+        return
+
+    if not hasattr(os, "writev"):  # pragma: no cover
+        _write_all(fd, b"".join(chunks))
+        return
+
+    written = os.writev(fd, chunks)
+    if written < sum(map(len, chunks)):
+        # partial writes are rare on regular files, the rest is written normally
+        _write_all(fd, b"".join(chunks)[written:])
 
-        raise
 
-    if callback is not None:
-        await callback.on_folder_complete(folder)
+def _write_all(fd: int, data: bytes | bytearray) -> None:
+    """Writes all the data to the file descriptor."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
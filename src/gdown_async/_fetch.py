@@ -1,19 +1,36 @@
 # Copyright 2024 Francesco Gentile.
 # SPDX-License-Identifier: MIT
 
+import math
+
 import aiohttp
 import anyio
-import bs4
 
+from ._cache import cache_folder, get_cached_folder
+from ._parse import parse_file_name, parse_folder
 from ._records import File, Folder
-from ._utils import extract_file_id, extract_folder_id, init_session, is_url
+from ._retry import retry_get
+from ._utils import (
+    create_session,
+    extract_file_id,
+    extract_folder_id,
+    is_url,
+)
 
 
-async def fetch_file(id_or_url: str) -> File:
+async def fetch_file(
+    id_or_url: str,
+    *,
+    session: aiohttp.ClientSession | None = None,
+) -> File:
     """Retrieves the name of a Google Drive file.
 
     Args:
         id_or_url: The ID or URL of the Google Drive file.
+        session: The client session to use for the requests. If `None`, a new
+            session is created for this call and closed before returning (use a
+            [GDownClient][gdown_async.GDownClient] to reuse the connections across
+            multiple calls).
 
     Returns:
         The [File][gdown_async.File] instance.
@@ -23,40 +40,77 @@ async def fetch_file(id_or_url: str) -> File:
         RuntimeError: If an unexpected error occurs while fetching the file.
     """
     id_ = extract_file_id(id_or_url) if is_url(id_or_url) else id_or_url
-    async with aiohttp.ClientSession() as session:
-        init_session(session)
-        url = f"https://drive.google.com/file/d/{id_}/view?usp=drive_link"
-        async with session.get(url) as response:
-            if response.status != 200:
-                msg = f"No file found with ID '{id_}'."
-                raise FileNotFoundError(msg)
-
-            content = await response.text()
-
-    soup = bs4.BeautifulSoup(content, "html.parser")
-    if soup.title is None:
+    if session is None:
+        async with create_session() as new_session:
+            return await fetch_file(id_, session=new_session)
+
+    # small files are served directly with their name in the headers, so there is
+    # no need to download and parse the (much larger) viewer page
+    name = await _fetch_file_name(id_, session=session)
+    if name is not None:
+        return File(id_, name)
+
+    url = f"https://drive.google.com/file/d/{id_}/view?usp=drive_link"
+    async with await retry_get(session, url) as response:
+        if response.status != 200:
+            msg = f"No file found with ID '{id_}'."
+            raise FileNotFoundError(msg)
+
+        content = await response.read()
+
+    name = await anyio.to_thread.run_sync(parse_file_name, content)
+    if name is None:
         msg = f"An unexpected error occurred while fetching the file with ID '{id_}'."
         raise RuntimeError(msg)
 
-    return File(id_, soup.title.text.removesuffix(" - Google Drive"))
+    return File(id_, name)
 
 
-async def fetch_folder(id_or_url: str, *, max_depth: int | None = None) -> Folder:
+async def fetch_folder(
+    id_or_url: str,
+    *,
+    max_depth: int | None = None,
+    max_concurrency: int | None = 10,
+    use_cache: bool = True,
+    session: aiohttp.ClientSession | None = None,
+) -> Folder:
     """Retrieves the structure of a Google Drive folder.
 
     Args:
         id_or_url: The ID or URL of the Google Drive folder.
         max_depth: The maximum depth of the folder structure to retrieve. If `None`, the
             entire folder structure is fetched.
+        max_concurrency: The maximum number of folders fetched concurrently. If
+            `None`, the number of concurrent requests is not limited (this is not
+            recommended for large folders, since Google Drive may start rejecting
+            the requests).
+        use_cache: If `True`, the folders fetched in the last five minutes (by any
+            function of this package) are not requested again. Set this to `False`
+            to always retrieve the current contents of the folders.
+        session: The client session to use for the requests. If `None`, a new
+            session is created for this call and closed before returning (use a
+            [GDownClient][gdown_async.GDownClient] to reuse the connections across
+            multiple calls).
 
     Returns:
         The folder structure.
 
     Raises:
         ValueError: If the maximum depth is not a positive integer.
+        ValueError: If the maximum concurrency is less than 1.
         ValueError: If the folder URL is invalid.
         FileNotFoundError: If the folder does not exist.
     """
+    if session is None:
+        async with create_session() as new_session:
+            return await fetch_folder(
+                id_or_url,
+                max_depth=max_depth,
+                max_concurrency=max_concurrency,
+                use_cache=use_cache,
+                session=new_session,
+            )
+
     if max_depth is not None:
         if max_depth < 1:
             msg = f"Maximum depth must be a positive integer, got {max_depth}."
@@ -64,15 +118,24 @@ async def fetch_folder(id_or_url: str, *, max_depth: int | None = None) -> Folde
     elif max_depth is None:
         max_depth = -1
 
+    if max_concurrency is not None and max_concurrency < 1:
+        msg = f"Max concurrency must be greater than 0, got {max_concurrency}."
+        raise ValueError(msg)
+
     id_ = extract_folder_id(id_or_url) if is_url(id_or_url) else id_or_url
-    async with aiohttp.ClientSession() as session:
-        init_session(session)
-        folder = await _fetch_folder_rec(id_, depth=max_depth, session=session)
-        if folder is None:
-            msg = f"No folder found with ID '{id_}'."
-            raise FileNotFoundError(msg)
+    limiter = anyio.CapacityLimiter(max_concurrency or math.inf)
+    folder = await _fetch_folder_tree(
+        id_,
+        depth=max_depth,
+        session=session,
+        limiter=limiter,
+        use_cache=use_cache,
+    )
+    if folder is None:
+        msg = f"No folder found with ID '{id_}'."
+        raise FileNotFoundError(msg)
 
-        return folder
+    return folder
 
 
 # --------------------------------------------------------------------------- #
@@ -80,60 +143,117 @@ async def fetch_folder(id_or_url: str, *, max_depth: int | None = None) -> Folde
 # --------------------------------------------------------------------------- #
 
 
-async def _fetch_folder(id_: str, *, session: aiohttp.ClientSession) -> Folder | None:
-    """Fetches the name and contents of a Google Drive folder."""
+async def _fetch_folder_page(
+    id_: str,
+    *,
+    session: aiohttp.ClientSession,
+    limiter: anyio.CapacityLimiter,
+    use_cache: bool = True,
+) -> Folder | None:
+    """Fetches the name and the direct children of a Google Drive folder.
+
+    Args:
+        id_: The ID of the folder.
+        session: The client session to use for the request.
+        limiter: The limiter to acquire while the folder page is being requested.
+        use_cache: Whether to return the recently fetched listing of the folder
+            (if any) instead of requesting it again.
+
+    Returns:
+        The folder (whose subfolders are empty) or `None` if it cannot be found.
+    """
+    if use_cache and (folder := get_cached_folder(id_)) is not None:
+        return folder
+
     url = f"https://drive.google.com/drive/folders/{id_}"
-    async with session.get(url) as response:
+    async with limiter, await retry_get(session, url) as response:
         if response.status != 200:
             return None
 
-        content = await response.text()
-
-    soup = bs4.BeautifulSoup(content, "html.parser")
-    if soup.title is None:
-        return None
-    name = soup.title.text.removesuffix(" - Google Drive")
-
-    files = [
-        File(div["data-id"], div.find("div", class_="KL4NAf").text)
-        for div in soup.find_all("div", class_="WYuW0e Ss7qXc")
-    ]
+        content = await response.read()
 
-    folders = [
-        Folder(div["data-id"], div.find("div", class_="KL4NAf").text, [])
-        for div in soup.find_all("div", class_="WYuW0e RDfNAe Ss7qXc")
-    ]
+    # parsing is CPU-bound, so we run it in a worker thread to avoid blocking the
+    # event loop while the other folders are being fetched
+    folder = await anyio.to_thread.run_sync(parse_folder, id_, content)
+    if folder is not None:
+        cache_folder(folder)
 
-    return Folder(id_, name, files + folders)
+    return folder
 
 
-async def _fetch_folder_rec(
+async def _fetch_folder_tree(
     id_: str,
     *,
     depth: int,
     session: aiohttp.ClientSession,
+    limiter: anyio.CapacityLimiter,
+    use_cache: bool,
 ) -> Folder | None:
-    """Builds the structure of a Google Drive folder recursively."""
-    folder = await _fetch_folder(id_, session=session)
-    if folder is None or depth == 1:
-        return folder
+    """Builds the structure of a Google Drive folder.
+
+    All the subfolders are fetched within a single task group, so that each of them
+    is requested as soon as its parent has been parsed, whatever its depth.
+    """
 
-    async def _fetch_child(idx: int) -> None:
-        f = folder.children[idx]
-        f = await _fetch_folder_rec(f.id, depth=depth - 1, session=session)
-        if f is None:
+    async def _fetch_child(parent: Folder, idx: int, depth: int) -> None:
+        folder = await _fetch_folder_page(
+            parent.children[idx].id,
+            session=session,
+            limiter=limiter,
+            use_cache=use_cache,
+        )
+        if folder is None:
             # Here we raise so that all the other tasks are cancelled
             # and the main task can catch the exception and return None.
             raise RuntimeError
 
-        folder.children[idx] = f
+        parent.children[idx] = folder
+        _expand(folder, depth)
+
+    def _expand(folder: Folder, depth: int) -> None:
+        if depth == 1:
+            return
+
+        for idx, item in enumerate(folder.children):
+            if isinstance(item, Folder):
+                tg.start_soon(_fetch_child, folder, idx, depth - 1)
+
+    root = await _fetch_folder_page(
+        id_,
+        session=session,
+        limiter=limiter,
+        use_cache=use_cache,
+    )
+    if root is None:
+        return None
 
     try:
         async with anyio.create_task_group() as tg:
-            for idx, item in enumerate(folder.children):
-                if isinstance(item, Folder):
-                    tg.start_soon(_fetch_child, idx)
+            _expand(root, depth)
     except Exception:  # noqa: BLE001
         return None
 
-    return folder
+    return root
+
+
+async def _fetch_file_name(id_: str, *, session: aiohttp.ClientSession) -> str | None:
+    """Retrieves the name of a file from the headers of its download response."""
+    params = {"id": id_, "export": "download"}
+    url = "https://drive.google.com/uc"
+    # only the first byte is requested, so that the response is tiny and the
+    # connection can be reused once the body has been read
+    headers = {"Range": "bytes=0-0"}
+    response = await retry_get(session, url, params=params, headers=headers)
+    async with response:
+        disposition = response.content_disposition
+        if response.status not in (200, 206) or disposition is None:
+            # e.g., Google Drive asks to confirm the download of large files
+            return None
+
+        if response.status == 200 and response.content_length != 1:
+            # the range was ignored, close the connection instead of reading the file
+            response.close()
+        else:
+            await response.read()
+
+        return disposition.filename
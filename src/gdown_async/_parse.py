@@ -0,0 +1,299 @@
+# Copyright 2024 Francesco Gentile.
+# SPDX-License-Identifier: MIT
+
+import html
+import importlib.util
+import re
+from typing import cast
+
+import bs4
+
+from ._records import File, Folder
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # pragma: no cover
+    LexborHTMLParser = None
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # pragma: no cover
+    from json import loads as json_loads
+
+try:
+    from bs4.filter import SoupStrainer
+except ImportError:  # pragma: no cover (beautifulsoup4 < 4.13)
+    from bs4 import SoupStrainer  # pyright: ignore[reportPrivateImportUsage]
+
+# lxml's C parser is much faster than the pure Python one shipped with the stdlib
+_BS4_FEATURES = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+_TITLE_SUFFIX = " - Google Drive"
+_TITLE_OPEN = b"<title>"
+_TITLE_CLOSE = b"</title>"
+_TITLE_RE = re.compile(rb"<title[^>]*>(.*?)</title>", re.DOTALL | re.IGNORECASE)
+# only the divs of the folder items are built by BeautifulSoup (a regex is needed to
+# match a single class, since a plain string must match the whole attribute)
+_ITEMS_STRAINER = SoupStrainer(
+    "div",
+    attrs={"data-id": True, "class": re.compile(r"\bWYuW0e\b")},
+)
+# the items of a folder are embedded in its page as a JSON array inside a string
+_IVD_RE = re.compile(rb"window\['_DRIVE_ivd'\]\s*=\s*'((?:[^'\\]|\\.)*)'")
+_JS_ESCAPE_RE = re.compile(r"\\(x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|.)", re.DOTALL)
+# the opening tags of the folder items and the name of each item, so that the items
+# can be found with a single scan of the page when there is no embedded listing
+_ITEM_TAG_RE = re.compile(rb"<div\s[^>]*\bWYuW0e\b[^>]*>")
+_ITEM_CLASS_RE = re.compile(rb'\bclass="([^"]*)"')
+_ITEM_ID_RE = re.compile(rb'\bdata-id="([^"]+)"')
+_ITEM_NAME_RE = re.compile(rb'<div[^>]*\bclass="[^"]*\bKL4NAf\b[^"]*"[^>]*>([^<]*)<')
+_FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+# the tags of the download form and their attributes, which can appear in any order
+# and with any kind of quoting (the quoted values can contain a ">")
+_FORM_TAG_RE = re.compile(rb"""<form\b(?:"[^"]*"|'[^']*'|[^'">])*>""", re.IGNORECASE)
+_INPUT_TAG_RE = re.compile(rb"""<input\b(?:"[^"]*"|'[^']*'|[^'">])*>""", re.IGNORECASE)
+_ATTR_RE = re.compile(
+    rb"""([^\s"'<>/=]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))"""
+)
+
+
+def parse_file_name(content: bytes) -> str | None:
+    """Extracts the name of a Google Drive file from its viewer page.
+
+    Args:
+        content: The raw HTML content of the file viewer page.
+
+    Returns:
+        The name of the file or `None` if the page has no title.
+    """
+    return _parse_title(content)
+
+
+def parse_download_form(content: bytes) -> tuple[str, dict[str, str]] | None:
+    """Extracts the download form from the page asking to confirm a download.
+
+    Args:
+        content: The raw HTML content of the confirmation page.
+
+    Returns:
+        The URL the form is submitted to and its parameters, or `None` if the page
+        has no form.
+    """
+    # only the form block is scanned, so that the inputs outside of it are ignored
+    start = content.find(b"<form")
+    end = content.find(b"</form>", start)
+    form = content[start : None if end < 0 else end] if start >= 0 else b""
+    match = _FORM_TAG_RE.match(form)
+    action = _parse_attrs(match.group()).get("action") if match else None
+    if action is None:
+        # the page does not have the expected layout, fall back to a full parse
+        return _parse_download_form_bs4(content)
+
+    params: dict[str, str] = {}
+    for tag in _INPUT_TAG_RE.finditer(form):
+        attrs = _parse_attrs(tag.group())
+        if "name" in attrs:
+            params[attrs["name"]] = attrs.get("value", "")
+    return action, params
+
+
+def parse_folder(id_: str, content: bytes) -> Folder | None:
+    """Extracts the name and the contents of a Google Drive folder from its page.
+
+    Note:
+        The subfolders of the returned folder are empty, i.e. only the direct
+        children of the folder are extracted.
+
+    Args:
+        id_: The ID of the folder.
+        content: The raw HTML content of the folder page.
+
+    Returns:
+        The folder or `None` if the page has no title.
+    """
+    # the embedded listing is much cheaper to parse than the DOM of the page
+    folder = _parse_folder_ivd(id_, content)
+    if folder is None:
+        folder = _parse_folder_scan(id_, content)
+    if folder is not None:
+        return folder
+
+    if LexborHTMLParser is None:
+        return _parse_folder_bs4(id_, content)
+
+    name = _parse_title(content)
+    if name is None:
+        return None
+
+    tree = LexborHTMLParser(content)
+
+    children: list[File | Folder] = []
+    for selector, is_folder in (
+        ("div.WYuW0e.Ss7qXc:not(.RDfNAe)", False),
+        ("div.WYuW0e.RDfNAe.Ss7qXc", True),
+    ):
+        for node in tree.css(selector):
+            child_id = node.attributes.get("data-id")
+            child_name = node.css_first("div.KL4NAf")
+            if child_id is None or child_name is None:
+                continue
+
+            if is_folder:
+                children.append(Folder(child_id, child_name.text(), []))
+            else:
+                children.append(File(child_id, child_name.text()))
+
+    return Folder(id_, name, children)
+
+
+# --------------------------------------------------------------------------- #
+# Private functions
+# --------------------------------------------------------------------------- #
+
+
+def _parse_title(content: bytes) -> str | None:
+    """Extracts the title of a Google Drive page (without the common suffix)."""
+    # fast path for the plain tag used by Google Drive, the regex handles the rest
+    start = content.find(_TITLE_OPEN)
+    end = content.find(_TITLE_CLOSE, start) if start >= 0 else -1
+    if end >= 0:
+        raw = content[start + len(_TITLE_OPEN) : end]
+    elif (match := _TITLE_RE.search(content)) is not None:
+        raw = match.group(1)
+    else:
+        return None
+
+    # only the title is decoded, the rest of the page is matched as bytes
+    title = html.unescape(raw.decode(errors="replace"))
+    return title.removesuffix(_TITLE_SUFFIX)
+
+
+def _parse_folder_ivd(id_: str, content: bytes) -> Folder | None:
+    """Parses the listing embedded in a Google Drive folder page (if any)."""
+    name = _parse_title(content)
+    match = _IVD_RE.search(content)
+    if name is None or match is None:
+        return None
+
+    try:
+        blob = match.group(1).decode()
+        data = json_loads(_JS_ESCAPE_RE.sub(_unescape_js, blob))
+        items = cast("list[list[object]] | None", data[0])
+        files: list[File | Folder] = []
+        folders: list[File | Folder] = []
+        # each item is an array starting with [id, parents, name, mime type, ...]
+        for item in items or []:
+            child_id, child_name, mime_type = str(item[0]), str(item[2]), item[3]
+            if mime_type == _FOLDER_MIME_TYPE:
+                folders.append(Folder(child_id, child_name, []))
+            else:
+                files.append(File(child_id, child_name))
+    except (ValueError, TypeError, IndexError, KeyError):
+        # the layout of the listing has changed (e.g. an object instead of an array),
+        # fall back to parsing the DOM
+        return None
+
+    return Folder(id_, name, files + folders)
+
+
+def _parse_folder_scan(id_: str, content: bytes) -> Folder | None:
+    """Scans the items of a Google Drive folder page without building its DOM."""
+    name = _parse_title(content)
+    if name is None:
+        return None
+
+    files: list[File | Folder] = []
+    folders: list[File | Folder] = []
+    matches = list(_ITEM_TAG_RE.finditer(content))
+    for idx, match in enumerate(matches):
+        tag = match.group()
+        class_match = _ITEM_CLASS_RE.search(tag)
+        id_match = _ITEM_ID_RE.search(tag)
+        # the name must be found before the next item, otherwise an item without a
+        # name would take the one of the next item
+        end = matches[idx + 1].start() if idx + 1 < len(matches) else len(content)
+        name_match = _ITEM_NAME_RE.search(content, match.end(), end)
+        if class_match is None or id_match is None or name_match is None:
+            continue
+
+        classes = class_match.group(1).split()
+        if b"WYuW0e" not in classes or b"Ss7qXc" not in classes:
+            continue
+
+        child_id = html.unescape(id_match.group(1).decode())
+        child_name = html.unescape(name_match.group(1).decode(errors="replace"))
+        if b"RDfNAe" in classes:
+            folders.append(Folder(child_id, child_name, []))
+        else:
+            files.append(File(child_id, child_name))
+
+    if not files and not folders:
+        # either the folder is empty or the layout of the page has changed, let the
+        # HTML parsers handle it
+        return None
+
+    return Folder(id_, name, files + folders)
+
+
+def _unescape_js(match: re.Match[str]) -> str:
+    """Decodes an escape sequence of a JavaScript string literal."""
+    escape = match.group(1)
+    if escape[0] in "xu" and len(escape) > 1:
+        return chr(int(escape[1:], 16))
+
+    return {"n": "\n", "r": "\r", "t": "\t"}.get(escape, escape)
+
+
+def _parse_folder_bs4(id_: str, content: bytes) -> Folder | None:
+    """Parses a Google Drive folder page with BeautifulSoup."""
+    name = _parse_title(content)
+    if name is None:
+        return None
+
+    # only the items of the folder are parsed, the rest of the page is discarded
+    soup = bs4.BeautifulSoup(
+        content,
+        _BS4_FEATURES,
+        parse_only=_ITEMS_STRAINER,
+        from_encoding="utf-8",
+    )
+    files: list[File | Folder] = []
+    folders: list[File | Folder] = []
+    for div in soup.find_all("div", recursive=False):
+        classes = div.get_attribute_list("class")
+        child_name = div.find("div", class_="KL4NAf")
+        if "WYuW0e" not in classes or "Ss7qXc" not in classes or child_name is None:
+            continue
+
+        child_id = str(div["data-id"])
+        if "RDfNAe" in classes:
+            folders.append(Folder(child_id, child_name.text, []))
+        else:
+            files.append(File(child_id, child_name.text))
+
+    return Folder(id_, name, files + folders)
+
+
+def _parse_attrs(tag: bytes) -> dict[str, str]:
+    """Extracts the attributes of an HTML opening tag."""
+    attrs: dict[str, str] = {}
+    for m in _ATTR_RE.finditer(tag):
+        value = next((v for v in m.group(2, 3, 4) if v is not None), b"")
+        # as in HTML, only the first occurrence of an attribute is considered
+        attrs.setdefault(m.group(1).decode().lower(), html.unescape(value.decode()))
+    return attrs
+
+
+def _parse_download_form_bs4(content: bytes) -> tuple[str, dict[str, str]] | None:
+    """Parses the download confirmation page with BeautifulSoup."""
+    soup = bs4.BeautifulSoup(content, _BS4_FEATURES)
+    form = soup.find("form")
+    if form is None or form.get("action") is None:
+        return None
+
+    params = {
+        str(input_["name"]): str(input_.get("value", ""))
+        for input_ in form.find_all("input")
+        if input_.get("name") is not None
+    }
+    return str(form["action"]), params
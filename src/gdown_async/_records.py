@@ -7,7 +7,7 @@ from collections.abc import Iterator
 from typing_extensions import Self
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class File:
     """A Google Drive file."""
 
@@ -15,7 +15,7 @@ class File:
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Folder:
     """A Google Drive folder."""
 
@@ -0,0 +1,89 @@
+# Copyright 2024 Francesco Gentile.
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import random
+from collections.abc import Mapping
+
+import aiohttp
+import anyio
+
+# status codes returned by Google Drive when it is overloaded or rate limiting us
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_GOLDEN_RATIO = 1.618
+_MAX_JITTER = 0.25
+
+
+async def retry_get(  # noqa: PLR0913
+    session: aiohttp.ClientSession,
+    url: str,
+    *,
+    params: Mapping[str, str] | None = None,
+    headers: Mapping[str, str] | None = None,
+    max_tries: int = 6,
+    base: float = 0.5,
+    cap: float = 20.0,
+) -> aiohttp.ClientResponse:
+    """Sends a GET request, retrying it on transient failures.
+
+    The request is retried if the server answers with a status code that signals a
+    temporary failure (i.e., 429 or 5xx) or if the connection fails. Between two
+    attempts, the function waits for the time requested by the `Retry-After`
+    header (if present) or for a capped exponential backoff with random jitter.
+
+    Args:
+        session: The client session to use for the request.
+        url: The URL to request.
+        params: The query parameters of the request.
+        headers: The headers of the request.
+        max_tries: The maximum number of attempts.
+        base: The delay (in seconds) before the first retry.
+        cap: The maximum delay (in seconds) between two attempts.
+
+    Returns:
+        The response of the last attempt. If all the attempts fail with a retryable
+        status code, the last response is returned anyway, so the caller is in
+        charge of checking its status and of closing it.
+
+    Raises:
+        aiohttp.ClientConnectionError: If the last attempt fails to connect.
+        asyncio.TimeoutError: If the last attempt times out.
+    """
+    for attempt in range(max_tries - 1):
+        try:
+            response = await session.get(url, params=params, headers=headers)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            delay = _backoff(attempt, base=base, cap=cap)
+        else:
+            if response.status not in _RETRY_STATUSES:
+                return response
+
+            delay = _retry_after(response, cap=cap)
+            if delay is None:
+                delay = _backoff(attempt, base=base, cap=cap)
+            response.release()
+
+        await anyio.sleep(delay)
+
+    # last attempt, any failure is propagated to the caller
+    return await session.get(url, params=params, headers=headers)
+
+
+# --------------------------------------------------------------------------- #
+# Private functions
+# --------------------------------------------------------------------------- #
+
+
+def _backoff(attempt: int, *, base: float, cap: float) -> float:
+    """Computes the delay before the next attempt."""
+    jitter = random.uniform(0, _MAX_JITTER)  # noqa: S311
+    return min(cap, base * _GOLDEN_RATIO**attempt) + jitter
+
+
+def _retry_after(response: aiohttp.ClientResponse, *, cap: float) -> float | None:
+    """Parses the `Retry-After` header of the response (if in seconds)."""
+    value = response.headers.get("Retry-After")
+    if value is None or not value.isdigit():
+        return None
+
+    return min(cap, float(value))
@@ -1,44 +1,90 @@
 # Copyright 2024 Francesco Gentile.
 # SPDX-License-Identifier: MIT
 
-import urllib.parse
+import functools
+import os
+import pathlib
+import re
+import stat
 
 import aiohttp
 import anyio
 
 from ._records import Folder
 
+# Google Drive URLs are split into their path and query with a single match, so that
+# the IDs can be extracted without fully parsing the URL
+_DRIVE_URL_RE = re.compile(
+    r"https?://drive\.google\.com(?P<path>/[^?#]*)?(?:\?(?P<query>[^#]*))?(?:#.*)?",
+    re.DOTALL,
+)
+_FILE_PATH_RE = re.compile(r"/file/d/([A-Za-z0-9_-]+)(?:/|$)")
+_FOLDER_PATH_RE = re.compile(r"/drive/folders/([A-Za-z0-9_-]+)")
+_QUERY_ID_RE = re.compile(r"(?:^|&)id=([A-Za-z0-9_-]+)(?=&|$)")
+# the canonical sharing and download URLs are recognized with a prefix check,
+# without the full match above
+_FILE_URL_PREFIXES = (
+    "https://drive.google.com/file/d/",
+    "http://drive.google.com/file/d/",
+)
+_UC_URL_PREFIXES = ("https://drive.google.com/uc?", "http://drive.google.com/uc?")
+_FOLDER_URL_PREFIXES = (
+    "https://drive.google.com/drive/folders/",
+    "http://drive.google.com/drive/folders/",
+)
+_FILE_PATH_PREFIX = "/file/d/"
+_FOLDER_PATH_PREFIX = "/drive/folders/"
+_ID_RE = re.compile(r"[A-Za-z0-9_-]+")
+# number of URLs whose ID is memoized (enough for the items of large folders)
+_ID_CACHE_SIZE = 4096
+_FILE_URL_ERROR = "Invalid Google Drive file URL '{}'."
+_FOLDER_URL_ERROR = "Invalid Google Drive folder URL '{}'."
+
 _USER_AGENT = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
     "(KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36"
 )
 
+# Google Drive starts answering with 429/5xx errors if too many requests are sent
+# at the same time, so we limit the number of connections opened by a session
+_MAX_CONNECTIONS = 64
+_MAX_CONNECTIONS_PER_HOST = 16
+_DNS_CACHE_TTL = 300
 
-def init_session(session: aiohttp.ClientSession) -> None:
-    """Initializes the session with the default headers."""
-    session.headers["User-Agent"] = _USER_AGENT
 
+def create_session() -> aiohttp.ClientSession:
+    """Creates a new client session with the default headers and connection limits.
 
-async def check_file_path(path: anyio.Path) -> None:
+    Note:
+        This function must be called from within a running event loop.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=_MAX_CONNECTIONS,
+        limit_per_host=_MAX_CONNECTIONS_PER_HOST,
+        ttl_dns_cache=_DNS_CACHE_TTL,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers={"User-Agent": _USER_AGENT},
+    )
+
+
+async def check_file_path(path: anyio.Path) -> bool:
     """Checks that the provided path can be used as an output file.
 
     Args:
         path: The path to check.
 
+    Returns:
+        Whether the file already exists.
+
     Raises:
         IsADirectoryError: If the path is a directory.
+        PermissionError: If the file does not exist and its parent directory is not
+            writable.
     """
-    if await path.exists():
-        if not await path.is_file():
-            msg = f"Output path '{path}' is not a file."
-            raise IsADirectoryError(msg)
-
-        return
-
-    # to verify that the provided path is valid, we try to create it and then delete it
-    await path.parent.mkdir(parents=True, exist_ok=True)
-    await path.touch()
-    await path.unlink()
+    # all the checks are done in a single round trip to the worker threads
+    return await anyio.to_thread.run_sync(_check_file_path, pathlib.Path(path))
 
 
 async def check_folder_path(folder: Folder, path: anyio.Path) -> None:
@@ -53,22 +99,11 @@ async def check_folder_path(folder: Folder, path: anyio.Path) -> None:
             any of its subfolders is not a directory.
         IsADirectoryError: If any path in the folder associated to a file within the
             folder (or any of its subfolders) is a directory.
+        PermissionError: If a file within the folder (or any of its subfolders)
+            does not exist and its directory is not writable.
     """
-    if await path.exists():
-        if not await path.is_dir():
-            msg = f"Output directory '{path}' is not a directory."
-            raise NotADirectoryError(msg)
-
-        for item in folder:
-            if isinstance(item, Folder):
-                await check_folder_path(item, path / item.name)
-            else:
-                await check_file_path(path / item.name)
-
-        return
-
-    # to verify that the path is valid, we try to create it
-    await path.mkdir(parents=True, exist_ok=True)
+    # the whole tree is checked with a single round trip to the worker threads
+    await anyio.to_thread.run_sync(_check_folder_path, folder, pathlib.Path(path))
 
 
 def is_url(url: str) -> bool:
@@ -76,6 +111,7 @@ def is_url(url: str) -> bool:
     return url.startswith(("http://", "https://"))
 
 
+@functools.lru_cache(maxsize=_ID_CACHE_SIZE)
 def extract_file_id(url: str) -> str:
     """Extracts the file ID from a Google Drive URL.
 
@@ -92,23 +128,36 @@ def extract_file_id(url: str) -> str:
     Raises:
         ValueError: If the URL is invalid.
     """
-    parsed = urllib.parse.urlparse(url)
-    if parsed.netloc != "drive.google.com":
-        msg = f"Invalid Google Drive file URL '{url}'."
+    if url.startswith(_FILE_URL_PREFIXES):
+        # the ID must be followed by a delimiter or by the end of the URL (the empty
+        # string is contained in any string)
+        match = _ID_RE.match(url, url.index(_FILE_PATH_PREFIX) + len(_FILE_PATH_PREFIX))
+        if match is not None and url[match.end() : match.end() + 1] in "/?#":
+            return match[0]
+    elif url.startswith(_UC_URL_PREFIXES):
+        query = url[url.index("?") + 1 :].partition("#")[0]
+        ids = [param[3:] for param in query.split("&") if param.startswith("id=")]
+        if len(ids) == 1 and _ID_RE.fullmatch(ids[0]):
+            return ids[0]
+
+    match = _DRIVE_URL_RE.fullmatch(url)
+    if match is None:
+        msg = _FILE_URL_ERROR.format(url)
         raise ValueError(msg)
 
-    parts = parsed.path.split("/")
-    if len(parts) >= 4 and parts[1] == "file" and parts[2] == "d":
-        return parts[3]
+    path_match = _FILE_PATH_RE.match(match["path"] or "")
+    if path_match is not None:
+        return path_match[1]
 
-    query = urllib.parse.parse_qs(parsed.query)
-    if "id" in query and len(query["id"]) == 1:
-        return query["id"][0]
+    ids = _QUERY_ID_RE.findall(match["query"] or "")
+    if len(ids) == 1:
+        return ids[0]
 
-    msg = f"Invalid Google Drive file URL '{url}'."
+    msg = _FILE_URL_ERROR.format(url)
     raise ValueError(msg)
 
 
+@functools.lru_cache(maxsize=_ID_CACHE_SIZE)
 def extract_folder_id(url: str) -> str:
     """Extracts the folder ID from a Google Drive URL.
 
@@ -124,18 +173,79 @@ def extract_folder_id(url: str) -> str:
     Raises:
         ValueError: If the URL is invalid.
     """
-    parsed = urllib.parse.urlparse(url)
-    if parsed.netloc != "drive.google.com":
-        msg = f"Invalid Google Drive folder URL '{url}'."
+    if url.startswith(_FOLDER_URL_PREFIXES):
+        start = url.index(_FOLDER_PATH_PREFIX) + len(_FOLDER_PATH_PREFIX)
+        match = _ID_RE.match(url, start)
+        if match is not None and url[match.end() : match.end() + 1] in "?#":
+            return match[0]
+
+    match = _DRIVE_URL_RE.fullmatch(url)
+    path_match = (
+        None if match is None else _FOLDER_PATH_RE.fullmatch(match["path"] or "")
+    )
+    if path_match is None:
+        msg = _FOLDER_URL_ERROR.format(url)
         raise ValueError(msg)
 
-    parts = parsed.path.split("/")
-    if len(parts) != 4 or parts[1] != "drive" or parts[2] != "folders":
-        msg = f"Invalid Google Drive folder URL '{url}'."
-        raise ValueError(msg)
+    return path_match[1]
+
+
+# --------------------------------------------------------------------------- #
+# Private functions
+# --------------------------------------------------------------------------- #
+
+
+def _check_file_path(path: pathlib.Path) -> bool:
+    """Synchronous version of `check_file_path`."""
+    try:
+        if not stat.S_ISREG(path.stat().st_mode):
+            msg = f"Output path '{path}' is not a file."
+            raise IsADirectoryError(msg)
+    except FileNotFoundError:
+        pass
+    else:
+        return True
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _check_writable(path.parent)
+    return False
+
+
+def _check_folder_path(folder: Folder, path: pathlib.Path) -> None:
+    """Synchronous version of `check_folder_path`."""
+    try:
+        # a single scan of the directory replaces a stat call per item
+        with os.scandir(path) as it:
+            entries = {entry.name: entry for entry in it}
+    except FileNotFoundError:
+        # to verify that the path is valid, we try to create it
+        path.mkdir(parents=True, exist_ok=True)
+        return
+    except NotADirectoryError:
+        msg = f"Output directory '{path}' is not a directory."
+        raise NotADirectoryError(msg) from None
+
+    writable = False
+    for item in folder:
+        entry = entries.get(item.name)
+        if isinstance(item, Folder):
+            if entry is not None and not entry.is_dir():
+                msg = f"Output directory '{path / item.name}' is not a directory."
+                raise NotADirectoryError(msg)
+
+            _check_folder_path(item, path / item.name)
+        elif entry is None:
+            # the directory is checked once, no matter how many files are missing
+            if not writable:
+                _check_writable(path)
+                writable = True
+        elif not entry.is_file():
+            msg = f"Output path '{path / item.name}' is not a file."
+            raise IsADirectoryError(msg)
 
-    if not parts[3]:
-        msg = f"Invalid Google Drive folder URL '{url}'."
-        raise ValueError(msg)
 
-    return parts[3]
+def _check_writable(path: pathlib.Path) -> None:
+    """Verifies that new files can be created in the directory."""
+    if not os.access(path, os.W_OK):
+        msg = f"Output directory '{path}' is not writable."
+        raise PermissionError(msg)
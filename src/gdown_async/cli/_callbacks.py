@@ -9,6 +9,7 @@ from rich.progress import (
     BarColumn,
     DownloadColumn,
     Progress,
+    ProgressColumn,
     TextColumn,
     TimeElapsedColumn,
     TimeRemainingColumn,
@@ -50,16 +51,7 @@ class ProgressFileDownloadCallback(FileDownloadCallback):
     async def on_file_setup(self, file: File, path: anyio.Path) -> None:
         self.console.print(f"[cyan]Downloading[/] '{file.name}' to '{path}'")
         self.progress = Progress(
-            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-            BarColumn(),
-            DownloadColumn(),
-            TextColumn("["),
-            TimeElapsedColumn(),
-            TextColumn("<"),
-            TimeRemainingColumn(),
-            TextColumn(","),
-            TransferSpeedColumn(),
-            TextColumn("]"),
+            *_get_progress_columns(),
             console=self.console,
             transient=self.transient,
         )
@@ -133,6 +125,10 @@ class TreeFolderDownloadCallback(FolderDownloadCallback):
         self.console = console or rich.get_console()
         self.nodes: dict[str, Tree] | None = None
         self.live: Live | None = None
+        # the last percentage displayed for each file being downloaded and the part
+        # of its label that precedes the percentage
+        self.percentages: dict[str, int] = {}
+        self.prefixes: dict[str, str] = {}
 
     @override
     async def on_folder_setup(self, folder: Folder, path: anyio.Path) -> None:
@@ -151,6 +147,8 @@ class TreeFolderDownloadCallback(FolderDownloadCallback):
 
         tree = self.nodes[folder.id]
         tree.label = f"📁 {folder.name} 🔄 [Downloading]"
+        # the items of the folder may have been retrieved only now
+        _add_items(tree, folder, self.nodes)
 
     @override
     async def on_file_setup(self, file: File, path: anyio.Path) -> None:
@@ -160,6 +158,7 @@ class TreeFolderDownloadCallback(FolderDownloadCallback):
 
         tree = self.nodes[file.id]
         tree.label = f"📄 {file.name} 🔄 [Downloading]"
+        self.prefixes[file.id] = f"📄 {file.name} 🔄 ["
 
     @override
     async def on_file_start(self, file: File, total: int) -> None:
@@ -168,7 +167,8 @@ class TreeFolderDownloadCallback(FolderDownloadCallback):
             raise RuntimeError(msg)
 
         tree = self.nodes[file.id]
-        tree.label = f"📄 {file.name} 🔄 [0%]"
+        tree.label = f"{self.prefixes[file.id]}0%]"
+        self.percentages[file.id] = 0
 
     @override
     async def on_file_resume(self, file: File, downloaded: int, total: int) -> None:
@@ -176,8 +176,10 @@ class TreeFolderDownloadCallback(FolderDownloadCallback):
             msg = "Callback not initialized."
             raise RuntimeError(msg)
 
+        percentage = round(downloaded * 100 / total)
         tree = self.nodes[file.id]
-        tree.label = f"📄 {file.name} 🔄 [{downloaded / total:.0%}]"
+        tree.label = f"{self.prefixes[file.id]}{percentage}%]"
+        self.percentages[file.id] = percentage
 
     @override
     async def on_file_progress(self, file: File, downloaded: int, total: int) -> None:
@@ -185,8 +187,14 @@ class TreeFolderDownloadCallback(FolderDownloadCallback):
             msg = "Callback not initialized."
             raise RuntimeError(msg)
 
+        # the label is rebuilt only when the displayed percentage changes
+        percentage = round(downloaded * 100 / total)
+        if self.percentages.get(file.id) == percentage:
+            return
+
         tree = self.nodes[file.id]
-        tree.label = f"📄 {file.name} 🔄 [{downloaded / total:.0%}]"
+        tree.label = f"{self.prefixes[file.id]}{percentage}%]"
+        self.percentages[file.id] = percentage
 
     @override
     async def on_file_complete(self, file: File, total: int) -> None:
@@ -196,6 +204,8 @@ class TreeFolderDownloadCallback(FolderDownloadCallback):
 
         tree = self.nodes[file.id]
         tree.label = f"📄 {file.name} ✅ [Downloaded]"
+        self.percentages.pop(file.id, None)
+        self.prefixes.pop(file.id, None)
 
     @override
     async def on_file_skip(self, file: File, path: anyio.Path) -> None:
@@ -212,6 +222,8 @@ class TreeFolderDownloadCallback(FolderDownloadCallback):
 
         tree = self.nodes[file.id]
         tree.label = f"📄 {file.name} ❌"
+        self.percentages.pop(file.id, None)
+        self.prefixes.pop(file.id, None)
 
     @override
     async def on_folder_complete(self, folder: Folder) -> None:
@@ -241,17 +253,46 @@ class TreeFolderDownloadCallback(FolderDownloadCallback):
             self.console.print("[red]Download failed[/]")
 
 
+def _get_progress_columns() -> tuple[ProgressColumn, ...]:
+    """Creates the columns of the file download progress bar."""
+    # the columns cannot be shared across progress bars, since some of them cache
+    # their rendering by task ID
+    return (
+        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        BarColumn(),
+        DownloadColumn(),
+        TextColumn("["),
+        TimeElapsedColumn(),
+        TextColumn("<"),
+        TimeRemainingColumn(),
+        TextColumn(","),
+        TransferSpeedColumn(),
+        TextColumn("]"),
+    )
+
+
 def _get_tree(folder: Folder) -> tuple[Tree, dict[str, Tree]]:
     """Builds a [Tree][rich.tree.Tree] from a folder structure."""
     tree = Tree(f"📁 {folder.name}")
     nodes: dict[str, Tree] = {folder.id: tree}
-    for item in folder:
-        if isinstance(item, File):
-            node = tree.add(f"📄 {item.name}")
-            nodes[item.id] = node
-        else:
-            sub_dir, sub_nodes = _get_tree(item)
-            tree.add(sub_dir)
-            nodes.update(sub_nodes)
+    _add_items(tree, folder, nodes)
 
     return tree, nodes
+
+
+def _add_items(tree: Tree, folder: Folder, nodes: dict[str, Tree]) -> None:
+    """Adds to the tree the items of the folder that are not already in it."""
+    # the subfolders are visited with an explicit stack, so that deep structures do
+    # not hit the recursion limit (the order of the children of a node is preserved)
+    stack = [(tree, folder)]
+    while stack:
+        tree, folder = stack.pop()
+        for item in folder:
+            if item.id in nodes:
+                continue
+
+            if isinstance(item, File):
+                nodes[item.id] = tree.add(f"📄 {item.name}")
+            else:
+                nodes[item.id] = node = tree.add(f"📁 {item.name}")
+                stack.append((node, item))
@@ -2,10 +2,9 @@
 # SPDX-License-Identifier: MIT
 
 import argparse
+import asyncio
 
-import anyio
-
-from gdown_async import __version__, download_file, download_folder, fetch_folder
+from gdown_async import Folder, GDownClient, __version__
 
 from ._callbacks import ProgressFileDownloadCallback, TreeFolderDownloadCallback
 
@@ -42,8 +41,8 @@ def get_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "-c",
         "--max-concurrency",
-        help="The maximum number of concurrent downloads. "
-        "This is only used for folder downloads.",
+        help="The maximum number of concurrent requests (both file downloads and "
+        "folder retrievals). This is only used for folder downloads.",
         type=int,
         default=None,
     )
@@ -62,7 +61,9 @@ def main() -> None:
     """Main entry point for the CLI."""
     parser = get_parser()
     args = parser.parse_args()
-    anyio.run(_download, args)
+    # aiohttp only supports asyncio, so the event loop is started without going
+    # through the backend selection of anyio
+    asyncio.run(_download(args))
 
 
 # --------------------------------------------------------------------------- #
@@ -71,20 +72,28 @@ def main() -> None:
 
 
 async def _download(args: argparse.Namespace) -> None:
-    if args.file:
-        await download_file(
-            args.file,
-            output_dir=args.output_dir,
-            force=args.force,
-            callback=ProgressFileDownloadCallback() if not args.quiet else None,
-        )
-    else:
+    # the fetch and the download of a folder share the connections of the client
+    async with GDownClient() as client:
+        if args.file:
+            await client.download_file(
+                args.file,
+                output_dir=args.output_dir,
+                force=args.force,
+                callback=ProgressFileDownloadCallback() if not args.quiet else None,
+            )
+            return
+
+        # without a maximum depth, the structure of the folder is retrieved while
+        # downloading it, so that the first files start downloading right away
+        folder: Folder | str = args.folder
         if args.max_depth is not None:
-            folder = await fetch_folder(args.folder, max_depth=args.max_depth)
-        else:
-            folder = await fetch_folder(args.folder)
+            folder = await client.fetch_folder(
+                args.folder,
+                max_depth=args.max_depth,
+                max_concurrency=args.max_concurrency or 10,
+            )
 
-        await download_folder(
+        await client.download_folder(
             folder,
             output_dir=args.output_dir,
             force=args.force,
@@ -1,7 +1,9 @@
 # Copyright 2024 Francesco Gentile.
 # SPDX-License-Identifier: MIT
 
+import ast
 import importlib.metadata
+import re
 import subprocess
 from pathlib import Path
 from typing import cast
@@ -9,25 +11,44 @@ from typing import cast
 import griffe
 
 PACKAGE = "gdown_async"
-PRIVATE_MODULES = {f"{PACKAGE}._utils"}
-
-
-def should_export(member: griffe.Object | griffe.Alias, module: griffe.Module) -> bool:
-    """Determines if a member should be exported in the __init__.py file."""
+PRIVATE_MODULES = {
+    f"{PACKAGE}._cache",
+    f"{PACKAGE}._parse",
+    f"{PACKAGE}._retry",
+    f"{PACKAGE}._utils",
+}
+# the generated part of an __init__.py file starts at the first of these lines
+IMPORT_PREFIXES = ("from", "import", "__all__")
+VERSION_RE = re.compile(r"^__version__.*$", re.MULTILINE)
+
+
+def should_export(member: griffe.Object | griffe.Alias, prefix: str) -> bool:
+    """Determines if a member should be exported in the __init__.py file.
+
+    Args:
+        member: The member to check.
+        prefix: The canonical path of the module of the member followed by a dot.
+    """
     if not member.is_public:
         return False
 
     # verify that the member has been defined in the module or in a sub-module
-    return member.canonical_path.startswith(module.canonical_path)
+    return member.canonical_path.startswith(prefix)
+
 
+def create_exports(module: griffe.Module) -> list[Path]:
+    """Creates the __init__.py file for the given module.
 
-def create_exports(module: griffe.Module) -> None:
-    """Creates the __init__.py file for the given module."""
+    Returns:
+        The files written for the module and its submodules (i.e., the files
+        whose exports have changed).
+    """
+    files: list[Path] = []
     for submodule in module.modules.values():
-        create_exports(submodule)
+        files.extend(create_exports(submodule))
 
     if not module.is_public:
-        return
+        return files
 
     exports: dict[str, list[str]] = {}
     __all__: set[str] = set()
@@ -35,68 +56,105 @@ def create_exports(module: griffe.Module) -> None:
         if submodule.canonical_path in PRIVATE_MODULES or submodule.is_public:
             continue
 
+        # the path of the module is resolved once for all its members
+        prefix = f"{submodule.canonical_path}."
         exports[subname] = [
-            n for n, m in submodule.members.items() if should_export(m, submodule)
+            n for n, m in submodule.members.items() if should_export(m, prefix)
         ]
         __all__.update(exports[subname])
 
     file = cast(Path, module.filepath)
-    lines: list[str] = []
-    with file.open("r") as f:
-        for line in f:
-            if line.startswith(("from", "import", "__all__")):
-                break
+    original = file.read_text()
+    expected = ({n: set(m) for n, m in exports.items() if m}, __all__)
+    if read_exports(original) == expected:
+        # the file on disk has been formatted by ruff (e.g., its imports have been
+        # sorted), so it is compared by its exports instead of its content
+        return files
+
+    lines = original.splitlines(keepends=True)
+    end = next(
+        (i for i, line in enumerate(lines) if line.startswith(IMPORT_PREFIXES)),
+        len(lines),
+    )
+
+    # keep the original content of the file (up to the first import)
+    content = lines[:end]
+
+    # write from ._sub import *
+    for name, members in exports.items():
+        if not members:
+            continue
+        content.append(f"from .{name} import {', '.join(members)}\n")
+
+    # write __all__ at the end of the file
+    content.append(f"\n__all__ = {sorted(__all__)}\n")
+    file.write_text("".join(content))
+    files.append(file)
 
-            lines.append(line)
+    return files
 
-    with file.open("w") as f:
-        # write the original content of the file
-        f.writelines(lines)
 
-        # write from ._sub import *
-        for name, members in exports.items():
-            if not members:
-                continue
-            f.write(f"from .{name} import {', '.join(members)}\n")
+def read_exports(source: str) -> tuple[dict[str, set[str]], set[str]]:
+    """Reads the exports of an __init__.py file.
 
-        # write __all__ at the end of the file
-        f.write(f"\n__all__ = {sorted(__all__)}\n")
+    Returns:
+        The names imported from each submodule and the names in `__all__`.
+    """
+    imports: dict[str, set[str]] = {}
+    names: set[str] = set()
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.ImportFrom) and node.level == 1 and node.module:
+            imports.setdefault(node.module, set()).update(a.name for a in node.names)
+        elif isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "__all__"
+            for target in node.targets
+        ):
+            names = set(ast.literal_eval(node.value))
 
+    return imports, names
 
-def write_version(module: griffe.Module) -> None:
-    """Writes the version in the _version.py file."""
+
+def write_version(module: griffe.Module) -> Path | None:
+    """Writes the version in the _version.py file.
+
+    Returns:
+        The file written or `None` if the version has not changed.
+    """
     version = importlib.metadata.version(PACKAGE)
     file = module.filepath
     if isinstance(file, list):
         msg = "Multiple files found for the module."
         raise RuntimeError(msg)  # noqa: TRY004
 
-    # find a __version__ line and replace it
-    lines: list[str] = []
-    found = False
-    with file.open("r") as f:
-        for line in f:
-            if line.startswith("__version__"):
-                line = f'__version__ = "{version}"\n'  # noqa: PLW2901
-                found = True
-            lines.append(line)
-
+    # find the __version__ lines and replace them
+    original = file.read_text()
+    content, found = VERSION_RE.subn(f'__version__ = "{version}"', original)
     if not found:
-        lines.append("\n")
-        lines.append(f"__version__ = '{version}'\n")
+        content += f"\n__version__ = '{version}'\n"
 
-    with file.open("w") as f:
-        f.writelines(lines)
+    if content == original:
+        return None
+
+    file.write_text(content)
+    return file
 
 
 def main() -> None:
     """Main entry point of the script."""
     module = cast(griffe.Module, griffe.load(PACKAGE))
-    write_version(module.modules["_version"])
-    create_exports(module)
+    version_file = write_version(module.modules["_version"])
+    files = create_exports(module)
+    if version_file is not None:
+        files.append(version_file)
+
+    if not files:
+        # nothing has changed, so there is nothing to format or check
+        return
 
-    subprocess.run(["ruff", "format", "src", "-q"], check=True)  # noqa: S603, S607
-    subprocess.run(["ruff", "check", "src", "-e", "-s"], check=True)  # noqa: S603, S607
+    # only the written files are formatted and checked, instead of the whole tree
+    paths = [str(file) for file in files]
+    subprocess.run(["ruff", "format", "-q", *paths], check=True)  # noqa: S603, S607
+    subprocess.run(["ruff", "check", "-e", "-s", *paths], check=True)  # noqa: S603, S607
 
 
 if __name__ == "__main__":